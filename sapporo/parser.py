@@ -2,6 +2,7 @@
 # coding: utf-8
 import re
 import tempfile
+import threading
 from pathlib import Path
 from typing import Any, Dict, List, Literal, Optional
 
@@ -12,6 +13,7 @@ from cwl_inputs_parser.utils import (download_file, is_remote_url,
                                      wf_location_to_inputs)
 from cwl_utils.parser import cwl_version, load_document_by_string
 from flask import abort
+from ruamel.yaml import YAML
 from schema_salad.utils import yaml_no_ts
 
 from sapporo.model import ParseRequest, ParseResult
@@ -73,19 +75,21 @@ def inspect_wf_type(wf_content: str, wf_location: str) -> WF_TYPES:
     return "unknown"
 
 
+PATTERN_SHEBANG = re.compile(r"#!.*?(cwl|nextflow|snakemake|cromwell|streamflow)")
+SHEBANG_WF_TYPES: Dict[str, WF_TYPES] = {
+    "cwl": "CWL",
+    "nextflow": "NFL",
+    "snakemake": "SMK",
+    "cromwell": "WDL",
+    "streamflow": "StreamFlow",
+}
+
+
 def check_by_shebang(wf_content: str) -> WF_TYPES:
-    first_line = wf_content.split("\n")[0]
-    if first_line.startswith("#!"):
-        if "cwl" in first_line:
-            return "CWL"
-        if "nextflow" in first_line:
-            return "NFL"
-        if "snakemake" in first_line:
-            return "SMK"
-        if "cromwell" in first_line:
-            return "WDL"
-        if "streamflow" in first_line:
-            return "StreamFlow"
+    first_line = wf_content.partition("\n")[0]
+    match = PATTERN_SHEBANG.match(first_line)
+    if match is not None:
+        return SHEBANG_WF_TYPES[match.group(1)]
 
     return "unknown"
 
@@ -104,12 +108,13 @@ PATTERN_NFL = re.compile(r"^process \w* \{$")
 
 
 def check_by_regexp(wf_content: str) -> WF_TYPES:
+    match_wdl, match_smk, match_nfl = PATTERN_WDL.match, PATTERN_SMK.match, PATTERN_NFL.match
     for line in wf_content.split("\n"):
-        if PATTERN_WDL.match(line):
+        if match_wdl(line):
             return "WDL"
-        if PATTERN_SMK.match(line):
+        if match_smk(line):
             return "SMK"
-        if PATTERN_NFL.match(line):
+        if match_nfl(line):
             return "NFL"
 
     return "unknown"
@@ -119,26 +124,42 @@ def inspect_wf_version(wf_content: str, wf_type: WF_TYPES) -> str:
     wf_version = "unknown"
     if wf_type == "CWL":
         wf_version = inspect_cwl_version(wf_content)
-    if wf_type == "WDL":
+    elif wf_type == "WDL":
         wf_version = inspect_wdl_version(wf_content)
-    if wf_type == "NFL":
+    elif wf_type == "NFL":
         wf_version = inspect_nfl_version(wf_content)
-    if wf_type == "SMK":
-        wf_version = inspect_smk_version()
-    if wf_type == "StreamFlow":
+    elif wf_type == "SMK":
+        # Snakemake workflows do not declare a language version.
+        wf_version = "1.0"
+    elif wf_type == "StreamFlow":
         wf_version = inspect_streamflow_version(wf_content)
 
     return wf_version
 
 
+_YAML_LOCAL = threading.local()
+
+
+def get_yaml_loader() -> YAML:
+    """\
+    `yaml_no_ts()` builds a new ruamel YAML object on every call, so keep one per thread and reuse it.
+    The YAML object is not safe to share between the threads serving requests.
+    """
+    yaml: Optional[YAML] = getattr(_YAML_LOCAL, "yaml", None)
+    if yaml is None:
+        yaml = yaml_no_ts()
+        _YAML_LOCAL.yaml = yaml
+
+    return yaml
+
+
 def inspect_cwl_version(wf_content: str) -> str:
     """\
     https://www.commonwl.org/v1.2/CommandLineTool.html#CWLVersion
     """
     default_cwl_version = "v1.0"
 
-    yaml = yaml_no_ts()
-    yaml_obj = yaml.load(wf_content)
+    yaml_obj = get_yaml_loader().load(wf_content)
 
     return cwl_version(yaml_obj) or default_cwl_version
 
@@ -149,8 +170,9 @@ PATTERN_WDL_VERSION = re.compile(r"^version \d\.\d$")
 def inspect_wdl_version(wf_content: str) -> str:
     default_wdl_version = "1.0"
 
+    match_wdl_version = PATTERN_WDL_VERSION.match
     for line in wf_content.split("\n"):
-        if PATTERN_WDL_VERSION.match(line):
+        if match_wdl_version(line):
             return line.split(" ")[1]
 
     return default_wdl_version
@@ -166,17 +188,10 @@ def inspect_nfl_version(wf_content: str) -> str:
     return default_nfl_version
 
 
-def inspect_smk_version() -> str:
-    default_smk_version = "1.0"
-
-    return default_smk_version
-
-
 def inspect_streamflow_version(wf_content: str) -> str:
     default_streamflow_version = "v1.0"
 
-    yaml = yaml_no_ts()
-    yaml_obj = yaml.load(wf_content)
+    yaml_obj = get_yaml_loader().load(wf_content)
 
     return yaml_obj['version'] or default_streamflow_version
 
@@ -5,14 +5,17 @@ import gc
 import hashlib
 import io
 import json
-import re
+import os
 import shlex
 import shutil
+import stat
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, TypedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TypedDict
 from urllib.parse import urlsplit
 
 import magic
@@ -110,6 +113,20 @@ EDAM_MAPPING: Dict[str, EDAM] = {
     },
 }
 
+# Known binary (compressed) formats, their content is never attached as text
+BINARY_EXTENSIONS = (".bam", ".bb", ".bw", ".fastq.gz", ".fq.gz", ".vcf.gz")
+
+# libyaml based loader if PyYAML was built with it
+YAML_SAFE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# @id of the Dataset entities for exe_dir and outputs_dir
+EXE_DIR_ID = f"{RUN_DIR_STRUCTURE['exe_dir']}/"
+OUTPUTS_DIR_ID = f"{RUN_DIR_STRUCTURE['outputs_dir']}/"
+
+EMPTY_SHA512 = hashlib.sha512(b"").hexdigest()
+
+_MAGIC_LOCAL = threading.local()
+
 
 # === functions ===
 
@@ -128,23 +145,36 @@ def generate_ro_crate(inputted_run_dir: str) -> None:
     if not run_dir.is_dir():
         raise NotADirectoryError(f"{run_dir} is not a directory.")
 
-    crate = ROCrate(init=False, gen_preview=False)
+    # Building the crate allocates many small, long-lived objects, which makes the cyclic GC
+    # rescan an ever-growing set of tracked objects. This runs in a short-lived process (run.sh),
+    # so the GC is simply paused while the crate entities are built (and left as it was if the caller had already paused it).
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        crate = ROCrate(init=False, gen_preview=False)
 
-    run_request: RunRequest = read_file(run_dir, "run_request")
-    run_id = run_dir.name
+        run_request: RunRequest = read_file(run_dir, "run_request")
+        run_id = run_dir.name
 
-    add_crate_metadata(crate)
-    add_run_crate_profile(crate)
-    add_workflow(crate, run_dir, run_request)
-    add_workflow_run(crate, run_dir, run_request, run_id)
+        add_crate_metadata(crate)
+        add_run_crate_profile(crate)
+        add_workflow(crate, run_dir, run_request)
+        create_action_ins = add_workflow_run(crate, run_dir, run_request, run_id)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # MultiQC stats (MultiQC allocates heavily and creates reference cycles, so it runs with the GC back on)
+    add_multiqc_stats(crate, run_dir, create_action_ins)
 
     jsonld = crate.metadata.generate()
+
     if isinstance(jsonld["@context"], str):
         jsonld["@context"] = [jsonld["@context"]]
     jsonld["@context"].append(SAPPORO_EXTRA_CONTEXT)
     jsonld["@context"].append(WF_RUN_CRATE_CONTEXT)
-    with run_dir.joinpath(crate.metadata.BASENAME).open(mode="w", encoding="utf-8") as f:
-        json.dump(jsonld, f, indent=2, sort_keys=True)
+    # json.dump() writes each encoded chunk separately; encode the whole document first and write it at once
+    run_dir.joinpath(crate.metadata.BASENAME).write_text(json.dumps(jsonld, indent=2, sort_keys=True), encoding="utf-8")
 
 
 def read_file(run_dir: Path, file_type: RUN_DIR_STRUCTURE_KEYS, one_line: bool = False, raw: bool = False) -> Any:
@@ -155,19 +185,26 @@ def read_file(run_dir: Path, file_type: RUN_DIR_STRUCTURE_KEYS, one_line: bool =
     if "dir" in file_type:
         return None
     file_path = run_dir.joinpath(RUN_DIR_STRUCTURE[file_type])
-    if file_path.exists() is False:
-        return None
-    if file_path.is_file() is False:
+    # Open directly instead of checking exists() and is_file() first, which costs two extra stat calls
+    try:
+        f = file_path.open(mode="r", encoding="utf-8")
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
         return None
-    with file_path.open(mode="r", encoding="utf-8") as f:
+    with f:
         if one_line:
             return f.readline().strip()
-        if raw:
-            return f.read()
-        try:
-            return yaml.load(f, Loader=yaml.SafeLoader)
-        except yaml.YAMLError:
-            return f.read()
+        content = f.read()
+    if raw:
+        return content
+    # The files in run_dir are written as JSON, so try the json module before the (much slower) YAML loader
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return yaml.load(content, Loader=YAML_SAFE_LOADER)
+    except yaml.YAMLError:
+        return content
 
 
 def add_crate_metadata(crate: ROCrate) -> None:
@@ -228,90 +265,167 @@ def update_local_file_stat(file_ins: File, file_path: Path, include_content: boo
     Add file stat such as `contentSize` and `sha512` to the file instance given as an argument.
     The instance itself is updated.
     """
-    if file_path.is_file() is False:
+    file_stat = generate_file_stat(file_path, include_content, include_force)
+    if file_stat is None:
         return None
-    if file_path.exists() is False:
-        return None
-
-    # From file stat
-    stat_result = file_path.stat()
+    apply_file_stat(file_ins, file_stat)
 
-    # https://schema.org/MediaObject
-    file_ins["contentSize"] = stat_result.st_size
-    file_ins["dateModified"] = datetime.fromtimestamp(stat_result.st_mtime).isoformat()
 
-    # add file line count
+def generate_file_stat(file_path: Path, include_content: bool = True, include_force: bool = False) -> Optional[Dict[str, Any]]:
+    """\
+    Collect the file stat without touching the crate.
+    This only reads the file, so it is safe to call from worker threads (see `add_workflow_run`).
+    """
+    # From file stat (a single stat call, instead of is_file(), exists() and stat())
     try:
-        file_ins["lineCount"] = count_lines(file_path)
-    except UnicodeDecodeError:
-        pass
+        stat_result = file_path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if stat.S_ISREG(stat_result.st_mode) is False:
+        return None
+
+    file_stat: Dict[str, Any] = {}
 
-    # checksum using sha512 (https://www.researchobject.org/ro-crate/1.1/appendix/implementation-notes.html#combining-with-other-packaging-schemes)
-    file_ins["sha512"] = generate_sha512(file_path)
+    # https://schema.org/MediaObject
+    file_stat["contentSize"] = stat_result.st_size
+    file_stat["dateModified"] = datetime.fromtimestamp(stat_result.st_mtime).isoformat()
 
-    if include_content:
-        # under 10kb, attach as text
-        if include_force or file_ins["contentSize"] < 10 * 1024:
+    # libmagic reports empty files as inode/x-empty only when given the path, so those are not sniffed in scan_file
+    edam = inspect_edam_format(file_path)
+    sniff_mime = edam is None and stat_result.st_size > 0
+
+    # under 10kb, attach as text
+    keep_content = include_content and (include_force or stat_result.st_size < 10 * 1024)
+
+    # add file line count and checksum using sha512 (https://www.researchobject.org/ro-crate/1.1/appendix/implementation-notes.html#combining-with-other-packaging-schemes)
+    mime: Optional[str] = None
+    content: Optional[bytes] = None
+    if stat_result.st_size == 0:
+        # Nothing to read (e.g. the stderr of most steps)
+        file_stat["sha512"], file_stat["lineCount"] = EMPTY_SHA512, 0
+        if keep_content:
+            content = b""
+    else:
+        file_stat["sha512"], line_count, mime, content = scan_file(file_path, sniff_mime, keep_content)
+        if line_count is not None:
+            file_stat["lineCount"] = line_count
+
+    if keep_content:
+        if content is None:
+            # With include_force, the file may not fit in a single read block of scan_file
+            content = file_path.read_bytes()
+        if is_binary_file(file_path, content) is False:
             try:
-                file_ins["text"] = file_path.read_text()
+                # Decoded in the same way as Path.read_text() (locale encoding, universal newlines)
+                file_stat["text"] = io.TextIOWrapper(io.BytesIO(content)).read()
             except UnicodeDecodeError:
                 pass
 
-    edam = inspect_edam_format(file_path)
     if edam is not None:
-        file_ins.append_to("encodingFormat", edam["url"], compact=True)
+        file_stat["encodingFormat"] = edam["url"]
     else:
         # https://pypi.org/project/python-magic/
-        file_ins["encodingFormat"] = magic.from_file(str(file_path), mime=True)  # type: ignore
+        file_stat["encodingFormat"] = mime if mime is not None else get_magic().from_file(str(file_path))
 
+    return file_stat
 
-def append_exe_dir_dataset(crate: ROCrate, ins: DataEntity) -> None:
-    for entity in crate.get_entities():
-        if isinstance(entity, Dataset):
-            if str(entity["@id"]) == f"{RUN_DIR_STRUCTURE['exe_dir']}/":
-                entity.append_to("hasPart", ins, compact=True)
 
+def generate_file_stats(file_paths: List[Path], include_content: bool = True) -> List[Optional[Dict[str, Any]]]:
+    """\
+    `generate_file_stat` for many files at once.
+    Hashing, line counting and libmagic release the GIL, so the files are processed in worker threads.
+    The crate itself is not thread-safe, so the results are applied by the caller.
+    The workers are capped so that many cores do not turn into many concurrent readers on the same disk.
+    A path given more than once (e.g. several output symlinks resolved to the same file) is read only once.
+    """
+    unique_paths = list(dict.fromkeys(file_paths))
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        file_stats = dict(zip(unique_paths, executor.map(lambda file_path: generate_file_stat(file_path, include_content), unique_paths)))
 
-def count_lines(file_path: Path) -> int:
-    block_size = 65536
-    count = 0
-    with file_path.open("r") as f:
-        while True:
-            buffer = f.read(block_size)
-            if not buffer:
-                break
-            count += buffer.count("\n")
+    return [file_stats[file_path] for file_path in file_paths]
 
-    del buffer
-    gc.collect()
 
-    return count
+def apply_file_stat(file_ins: File, file_stat: Dict[str, Any]) -> None:
+    for key in ["contentSize", "dateModified", "lineCount", "sha512", "text", "encodingFormat"]:
+        if key in file_stat:
+            file_ins[key] = file_stat[key]
+
+
+def append_exe_dir_dataset(crate: ROCrate, ins: DataEntity) -> None:
+    entity = crate.dereference(EXE_DIR_ID)
+    if isinstance(entity, Dataset):
+        entity.append_to("hasPart", ins, compact=True)
 
 
-def generate_sha512(file_path: Path) -> str:
-    block_size = 65536
+def scan_file(file_path: Path, sniff_mime: bool = False, keep_content: bool = False) -> Tuple[str, Optional[int], Optional[str], Optional[bytes]]:
+    """\
+    Compute the sha512 checksum and the line count of a file in a single pass over its content.
+    Lines are counted as `\\n` bytes, so a lone `\\r` (old Mac line ending) is not counted as a line break.
+    The line count is None for binary files (see `is_binary_file`, checked on the first read block).
+    If `sniff_mime` is True, the mime type is also detected by libmagic through the same open file.
+    If `keep_content` is True and the whole file fits in a single read block, the content is returned as well.
+    """
+    block_size = 1 << 20  # 1 MiB
     sha512 = hashlib.sha512()
+    line_count = 0
+    binary: Optional[bool] = None
+    content: Optional[bytes] = None
     with file_path.open("rb") as f:
         while True:
             buffer = f.read(block_size)
-            if not buffer:
-                break
             sha512.update(buffer)
+            if binary is None:
+                # Decided on the first block (gzip and BGZF headers contain NUL bytes)
+                binary = is_binary_file(file_path, buffer)
+            if binary is False:
+                line_count += buffer.count(b"\n")
+            if len(buffer) < block_size:
+                # A short read means EOF, so small files are done in one read call
+                if keep_content and f.tell() == len(buffer):
+                    content = buffer
+                break
+
+        mime: Optional[str] = None
+        if sniff_mime:
+            f.seek(0)
+            mime = get_magic().from_descriptor(f.fileno())
+
+    return sha512.hexdigest(), None if binary else line_count, mime, content
 
-    hash_ = str(sha512.hexdigest())
-    del sha512
-    gc.collect()
 
-    return hash_
+def get_magic() -> magic.Magic:
+    """\
+    `magic.from_file()` shares one Magic instance behind a lock, which serializes the worker threads in `add_workflow_run`.
+    Keep one instance (libmagic cookie) per thread instead.
+    """
+    magic_ins: Optional[magic.Magic] = getattr(_MAGIC_LOCAL, "magic", None)
+    if magic_ins is None:
+        magic_ins = magic.Magic(mime=True)
+        _MAGIC_LOCAL.magic = magic_ins
+
+    return magic_ins
+
+
+def is_binary_file(file_path: Path, content: bytes) -> bool:
+    """\
+    Guess from the extension or a NUL byte in the first 512 bytes of the content, without decoding it.
+    """
+    if file_path.name.lower().endswith(BINARY_EXTENSIONS):
+        return True
+    return b"\x00" in content[:512]
 
 
 def inspect_edam_format(file_path: Path) -> Optional[EDAM]:
     """\
     TODO: use tataki (https://github.com/suecharo/tataki)
     """
-    for ext, edam in EDAM_MAPPING.items():
-        if file_path.name.endswith(ext):
-            return edam
+    # Probe the compound extension (e.g. ".fastq.gz") before the last one
+    parts = file_path.name.lower().split(".")
+    for n in (2, 1):
+        if len(parts) > n:
+            edam = EDAM_MAPPING.get("." + ".".join(parts[-n:]))
+            if edam is not None:
+                return edam
 
     return None
 
@@ -323,7 +437,7 @@ def generate_wf_lang(crate: ROCrate, run_request: RunRequest) -> ComputerLanguag
     """
     wf_type: str = run_request["workflow_type"]  # type: ignore
     wf_type_version: str = run_request["workflow_type_version"]  # type: ignore
-    if re.search("^v", wf_type_version):
+    if wf_type_version.startswith("v"):
         wf_type_version = wf_type_version[1:]
 
     lang_type_for_ro_crate = wf_type
@@ -375,7 +489,7 @@ def generate_wf_lang(crate: ROCrate, run_request: RunRequest) -> ComputerLanguag
     return lang_ins
 
 
-def add_workflow_run(crate: ROCrate, run_dir: Path, run_request: RunRequest, run_id: str) -> None:
+def add_workflow_run(crate: ROCrate, run_dir: Path, run_request: RunRequest, run_id: str) -> ContextEntity:
     # Run metadata
     create_action_ins = ContextEntity(crate, identifier=run_id, properties={
         "@type": "CreateAction",
@@ -403,50 +517,67 @@ def add_workflow_run(crate: ROCrate, run_dir: Path, run_request: RunRequest, run
     # Run inputs
     # All workflow attachments (run_request["workflow_attachment"]) are treated as workflow inputs.
     # These workflow attachments are placed in exe_dir (downloaded)
-    main_wf_id = crate.mainEntity["@id"]
+    main_wf_id = str(crate.mainEntity["@id"])
     # This wf_attachment in run_request is a encoded JSON string
     wf_attachment: str = run_request["workflow_attachment"]  # type: ignore
     wf_attachment_obj: List[AttachedFile] = json.loads(wf_attachment)
+    exe_dir = run_dir.joinpath(RUN_DIR_STRUCTURE["exe_dir"])
+    attached_files: List[Tuple[AttachedFile, Path]] = []
     for item in wf_attachment_obj:
-        source = run_dir.joinpath(RUN_DIR_STRUCTURE["exe_dir"], item["file_name"])
-        dest = source.relative_to(run_dir)
-        if str(dest) == str(main_wf_id):
+        source = exe_dir.joinpath(item["file_name"])
+        if str(source.relative_to(run_dir)) == main_wf_id:
             continue
-        file_ins = File(crate, source, dest, properties={
+        attached_files.append((item, source))
+    attached_file_stats = generate_file_stats([source for _, source in attached_files], include_content=False)
+    attached_file_ins_list: List[File] = []
+    for (item, source), file_stat in zip(attached_files, attached_file_stats):
+        file_ins = File(crate, source, source.relative_to(run_dir), properties={
             "@type": "File",
             "url": item["file_url"],
         })
-        update_local_file_stat(file_ins, source, include_content=False)
+        if file_stat is not None:
+            apply_file_stat(file_ins, file_stat)
         append_exe_dir_dataset(crate, file_ins)
-        crate.add(file_ins)
+        attached_file_ins_list.append(file_ins)
         create_action_ins.append_to("object", file_ins)
+    crate.add(*attached_file_ins_list)
 
     # Run outputs
     outputs: Optional[List[AttachedFile]] = read_file(run_dir, "outputs")
-    for source in run_dir.joinpath(RUN_DIR_STRUCTURE["outputs_dir"]).glob("**/*"):
-        if source.is_dir():
-            continue
-
-        file_apath = source.resolve(strict=True)
+    output_urls: Dict[str, str] = {}
+    if outputs is not None:
+        output_urls = {str(output["file_name"]): output["file_url"] for output in outputs}
+    outputs_dir = run_dir.joinpath(RUN_DIR_STRUCTURE["outputs_dir"])
+    # The walk starts from a resolved directory and does not enter symlinked directories,
+    # so only the symlinks themselves need resolve(), which costs an lstat per path component.
+    output_files: List[Path] = [
+        Path(entry.path).resolve(strict=True) if entry.is_symlink() else Path(entry.path)
+        for entry in walk_files(outputs_dir.resolve())
+    ]
+    output_file_stats = generate_file_stats(output_files)
+    output_file_ins_list: List[File] = []
+    for file_apath, file_stat in zip(output_files, output_file_stats):
         file_rpath = file_apath.relative_to(run_dir)
 
         actual_file = File(crate, file_apath, file_rpath, properties={
             "@type": "File",
         })
-        update_local_file_stat(actual_file, file_apath)
+        if file_stat is not None:
+            apply_file_stat(actual_file, file_stat)
 
         if outputs is not None:
             # Include the URL of Sapporo's download feature
-            output_dir_dest = file_apath.relative_to(run_dir.joinpath(RUN_DIR_STRUCTURE["outputs_dir"]))
-            for output in outputs:
-                if str(output["file_name"]) == str(output_dir_dest):
-                    actual_file["url"] = output["file_url"]
+            output_dir_dest = str(file_apath.relative_to(outputs_dir))
+            if output_dir_dest in output_urls:
+                actual_file["url"] = output_urls[output_dir_dest]
 
-        add_file_stats(crate, actual_file)
+        output_file_ins_list.append(actual_file)
         append_outputs_dir_dataset(crate, actual_file)
 
         create_action_ins.append_to("result", actual_file)
-        crate.add(actual_file)
+    crate.add(*output_file_ins_list)
+
+    add_file_stats(crate, output_file_ins_list)
 
     # Log files
     # Add log files
@@ -467,8 +598,31 @@ def add_workflow_run(crate: ROCrate, run_dir: Path, run_request: RunRequest, run
         create_action_ins.append_to("subjectOf", file_ins)
         crate.add(file_ins)
 
-    # MultiQC stats
-    add_multiqc_stats(crate, run_dir, create_action_ins)
+    return create_action_ins
+
+
+def walk_files(dir_path: Path) -> Iterable["os.DirEntry[str]"]:
+    """\
+    Yield the entries of the files under `dir_path` in the same order as `dir_path.glob("**/*")`,
+    the files of a directory first, then those of its subdirectories.
+    Like glob, symlinks to directories are not followed.
+    Uses `os.scandir`, so that the file type comes from the directory entry instead of another stat call.
+    """
+    try:
+        with os.scandir(dir_path) as scandir_it:
+            entries = list(scandir_it)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return
+
+    sub_dirs: List[Path] = []
+    for entry in entries:
+        if entry.is_dir():
+            if entry.is_symlink() is False:
+                sub_dirs.append(Path(entry.path))
+            continue
+        yield entry
+    for sub_dir in sub_dirs:
+        yield from walk_files(sub_dir)
 
 
 def add_multiqc_stats(crate: ROCrate, run_dir: Path, create_action_ins: ContextEntity) -> None:
@@ -502,7 +656,7 @@ def add_multiqc_stats(crate: ROCrate, run_dir: Path, create_action_ins: ContextE
     crate.add(file_ins)
 
 
-def add_file_stats(crate: ROCrate, file_ins: File) -> None:
+def add_file_stats(crate: ROCrate, file_ins_list: List[File]) -> None:
     """\
     see "format" field of file_ins
 
@@ -511,116 +665,152 @@ def add_file_stats(crate: ROCrate, file_ins: File) -> None:
       -> quay.io/biocontainers/samtools:1.15.1--h1170115_0
     ".vcf": "http://edamontology.org/format_3016",
       -> quay.io/biocontainers/vcftools:0.1.16--pl5321h9a82719_6
+
+    Files are grouped by tool, so that each tool runs in a single container.
     """
     if shutil.which("docker") is None:
         return
 
-    formats = get_norm_value(file_ins, "encodingFormat")
-    for format_ in formats:
-        if format_ == "http://edamontology.org/format_2572" or format_ == "http://edamontology.org/format_2573":
-            # bam or sam
-            add_samtools_stats(crate, file_ins)
-        elif format_ == "http://edamontology.org/format_3016":
-            # vcf
-            add_vcftools_stats(crate, file_ins)
+    samtools_file_ins_list: List[File] = []
+    vcftools_file_ins_list: List[File] = []
+    for file_ins in file_ins_list:
+        formats = get_norm_value(file_ins, "encodingFormat")
+        for format_ in formats:
+            if format_ == "http://edamontology.org/format_2572" or format_ == "http://edamontology.org/format_2573":
+                # bam or sam
+                samtools_file_ins_list.append(file_ins)
+            elif format_ == "http://edamontology.org/format_3016":
+                # vcf
+                vcftools_file_ins_list.append(file_ins)
+
+    # The containers are independent of each other, so they are run concurrently.
+    # The crate is only updated in this thread.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        samtools_future = executor.submit(
+            run_in_container,
+            "quay.io/biocontainers/samtools:1.15.1--h1170115_0",
+            ["samtools", "flagstats", "--output-fmt", "json"],
+            [file_ins.source for file_ins in samtools_file_ins_list],
+        )
+        vcftools_future = executor.submit(
+            run_in_container,
+            "quay.io/biocontainers/vcftools:0.1.16--pl5321h9a82719_6",
+            ["vcf-stats"],
+            [file_ins.source for file_ins in vcftools_file_ins_list],
+        )
+    add_samtools_stats(crate, samtools_file_ins_list, samtools_future.result())
+    add_vcftools_stats(crate, vcftools_file_ins_list, vcftools_future.result())
+
+
+CONTAINER_OUTPUT_SEPARATOR = "===SAPPORO_FILE_STATS_END==="
+
+
+def run_in_container(image: str, cmd: List[str], sources: List[Path]) -> List[Optional[bytes]]:
+    """\
+    $ <cmd> <file_path> (for each file, in a single container)
+
+    Each file is mounted as /work/<index>/<name>.
+    Returns the stdout of each run, or None if the run failed.
+    """
+    if len(sources) == 0:
+        return []
+
+    docker_cmd = ["docker", "run", "--rm"]
+    for i, source in enumerate(sources):
+        docker_cmd.extend(["-v", f"{source}:/work/{i}/{source.name}"])
+    docker_cmd.extend([
+        "-w",
+        "/work",
+        image,
+        "sh",
+        "-c",
+        f"for f in \"$@\"; do {shlex.join(cmd)} \"$f\"; printf '\\n%s %s\\n' {CONTAINER_OUTPUT_SEPARATOR} $?; done",
+        "sh",
+    ])
+    docker_cmd.extend([f"{i}/{source.name}" for i, source in enumerate(sources)])
+    proc = subprocess.run(docker_cmd, capture_output=True, check=False)
 
+    outputs: List[Optional[bytes]] = []
+    rest = proc.stdout
+    separator = f"\n{CONTAINER_OUTPUT_SEPARATOR} ".encode()
+    for _ in sources:
+        stdout, found, rest = rest.partition(separator)
+        if not found:
+            break
+        exit_code, _, rest = rest.partition(b"\n")
+        outputs.append(stdout if exit_code == b"0" else None)
+    outputs.extend([None] * (len(sources) - len(outputs)))
 
-def add_samtools_stats(crate: ROCrate, file_ins: File) -> None:
+    return outputs
+
+
+def add_samtools_stats(crate: ROCrate, file_ins_list: List[File], outputs: List[Optional[bytes]]) -> None:
     """\
     $ samtools flagstats --output-fmt json <file_path>
 
     Using: quay.io/biocontainers/samtools:1.15.1--h1170115_0
     """
-    source = file_ins.source
-    cmd = shlex.split(" ".join([
-        "docker",
-        "run",
-        "--rm",
-        "-v",
-        f"{source}:/work/{source.name}",
-        "-w",
-        "/work",
-        "quay.io/biocontainers/samtools:1.15.1--h1170115_0",
-        "samtools",
-        "flagstats",
-        "--output-fmt",
-        "json",
-        source.name,
-    ]))
-    proc = subprocess.run(cmd, capture_output=True, check=False)
-    if proc.returncode != 0:
-        return
-    try:
-        stats = json.loads(proc.stdout)
-        total = stats["QC-passed reads"]["total"]
-        mapped = stats["QC-passed reads"]["mapped"]
-        unmapped = total - mapped
-        duplicate = stats["QC-passed reads"]["duplicates"]
-        stats_ins = ContextEntity(crate, properties={
-            "@type": ["FileStats"],
-            "totalReads": total,
-            "mappedReads": mapped,
-            "unmappedReads": unmapped,
-            "duplicateReads": duplicate,
-            "mappedRate": mapped / total,
-            "unmappedRate": unmapped / total,
-            "duplicateRate": duplicate / total,
-        })
-        stats_ins.append_to("generatedBy", find_or_generate_software_ins(crate, "samtools", "1.15.1--h1170115_0"), compact=True)
-        file_ins.append_to("stats", stats_ins, compact=True)
-        crate.add(stats_ins)
-    except json.JSONDecodeError:
-        return
+    for file_ins, stdout in zip(file_ins_list, outputs):
+        if stdout is None:
+            continue
+        try:
+            stats = json.loads(stdout)
+            total = stats["QC-passed reads"]["total"]
+            mapped = stats["QC-passed reads"]["mapped"]
+            unmapped = total - mapped
+            duplicate = stats["QC-passed reads"]["duplicates"]
+            stats_ins = ContextEntity(crate, properties={
+                "@type": ["FileStats"],
+                "totalReads": total,
+                "mappedReads": mapped,
+                "unmappedReads": unmapped,
+                "duplicateReads": duplicate,
+                "mappedRate": mapped / total,
+                "unmappedRate": unmapped / total,
+                "duplicateRate": duplicate / total,
+            })
+            stats_ins.append_to("generatedBy", find_or_generate_software_ins(crate, "samtools", "1.15.1--h1170115_0"), compact=True)
+            file_ins.append_to("stats", stats_ins, compact=True)
+            crate.add(stats_ins)
+        except json.JSONDecodeError:
+            continue
 
 
-def add_vcftools_stats(crate: ROCrate, file_ins: File) -> None:
+def add_vcftools_stats(crate: ROCrate, file_ins_list: List[File], outputs: List[Optional[bytes]]) -> None:
     """\
     $ vcf-stats <file_path>
 
     Using: quay.io/biocontainers/vcftools:0.1.16--pl5321h9a82719_6
     """
-    source = file_ins.source
-    cmd = shlex.split(" ".join([
-        "docker",
-        "run",
-        "--rm",
-        "-v",
-        f"{source}:/work/{source.name}",
-        "-w",
-        "/work",
-        "quay.io/biocontainers/vcftools:0.1.16--pl5321h9a82719_6",
-        "vcf-stats",
-        source.name,
-    ]))
-    proc = subprocess.run(cmd, capture_output=True, check=False)
-    if proc.returncode != 0:
-        return
-    try:
-        stdout = proc.stdout.decode()
-        stdout = stdout.strip()
-        stdout = stdout.lstrip("$VAR1 = ")
-        stdout = stdout.rstrip(";")
-        stdout = stdout.replace("=>", ":")
-        stdout = stdout.replace("\'", "\"")
-        stats = json.loads(stdout)
-        stats_ins = ContextEntity(crate, properties={
-            "@type": ["FileStats"],
-            "variantCount": stats["all"].get("count", 0),
-            "snpsCount": stats["all"].get("snp_count", 0),
-            "indelsCount": stats["all"].get("indel_count", 0),
-        })
-        stats_ins.append_to("generatedBy", find_or_generate_software_ins(crate, "vcftools", "0.1.16--pl5321h9a82719_6"), compact=True)
-        file_ins.append_to("stats", stats_ins, compact=True)
-        crate.add(stats_ins)
-    except json.JSONDecodeError:
-        return
+    for file_ins, stdout_bytes in zip(file_ins_list, outputs):
+        if stdout_bytes is None:
+            continue
+        try:
+            stdout = stdout_bytes.decode()
+            stdout = stdout.strip()
+            stdout = stdout.lstrip("$VAR1 = ")
+            stdout = stdout.rstrip(";")
+            stdout = stdout.replace("=>", ":")
+            stdout = stdout.replace("\'", "\"")
+            stats = json.loads(stdout)
+            stats_ins = ContextEntity(crate, properties={
+                "@type": ["FileStats"],
+                "variantCount": stats["all"].get("count", 0),
+                "snpsCount": stats["all"].get("snp_count", 0),
+                "indelsCount": stats["all"].get("indel_count", 0),
+            })
+            stats_ins.append_to("generatedBy", find_or_generate_software_ins(crate, "vcftools", "0.1.16--pl5321h9a82719_6"), compact=True)
+            file_ins.append_to("stats", stats_ins, compact=True)
+            crate.add(stats_ins)
+        except json.JSONDecodeError:
+            continue
 
 
 def find_or_generate_software_ins(crate: ROCrate, name: str, version: str) -> SoftwareApplication:
-    for entity in crate.get_entities():
-        if isinstance(entity, SoftwareApplication):
-            if entity["name"] == name:
-                return entity
+    # The instance is identified by its name (`#<name>`), so it can be looked up directly
+    entity = crate.dereference(f"#{name}")
+    if isinstance(entity, SoftwareApplication):
+        return entity
     software_ins = SoftwareApplication(crate, identifier=name, properties={
         "name": name,
         "version": version
@@ -631,17 +821,15 @@ def find_or_generate_software_ins(crate: ROCrate, name: str, version: str) -> So
 
 
 def append_outputs_dir_dataset(crate: ROCrate, ins: DataEntity) -> None:
-    for entity in crate.get_entities():
-        if isinstance(entity, Dataset):
-            if str(entity["@id"]) == f"{RUN_DIR_STRUCTURE['outputs_dir']}/":
-                entity.append_to("hasPart", ins, compact=True)
+    entity = crate.dereference(OUTPUTS_DIR_ID)
+    if isinstance(entity, Dataset):
+        entity.append_to("hasPart", ins, compact=True)
 
 
 def extract_exe_dir_file_ids(crate: ROCrate) -> List[str]:
-    for entity in crate.get_entities():
-        if isinstance(entity, Dataset):
-            if str(entity["@id"]) == f"{RUN_DIR_STRUCTURE['exe_dir']}/":
-                return get_norm_value(entity, "hasPart")  # type: ignore
+    entity = crate.dereference(EXE_DIR_ID)
+    if isinstance(entity, Dataset):
+        return get_norm_value(entity, "hasPart")  # type: ignore
     return []
 
 
@@ -3,7 +3,6 @@
 import collections
 import json
 import os
-import shlex
 import shutil
 import signal
 from pathlib import Path, PurePath
@@ -252,10 +251,11 @@ def fork_run(run_id: str, username: Optional[str] = None) -> None:
     run_dir: Path = resolve_run_dir_path(run_id)
     stdout: Path = resolve_content_path(run_id, "stdout")
     stderr: Path = resolve_content_path(run_id, "stderr")
-    cmd: str = f"/bin/bash {current_app.config['RUN_SH']} {run_dir}"
+    # Passed to Popen as an argument list, so paths containing spaces are not split
+    cmd: List[str] = ["/bin/bash", str(current_app.config["RUN_SH"]), str(run_dir)]
     write_file(run_id, "state", "QUEUED")
     with stdout.open(mode="w", encoding="utf-8") as f_stdout, stderr.open(mode="w", encoding="utf-8") as f_stderr:
-        process = Popen(shlex.split(cmd),  # pylint: disable=consider-using-with
+        process = Popen(cmd,  # pylint: disable=consider-using-with
                         cwd=str(run_dir),
                         env=os.environ.copy(),
                         encoding="utf-8",
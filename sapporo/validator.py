@@ -168,7 +168,7 @@ def validate_wf_docs_with_registered_wf(wf_name: str, wf_attachment: List[Attach
     wf_url = wf["workflow_url"]
     wf_type = wf["workflow_type"]
     wf_type_version = wf["workflow_type_version"]
-    wf_attachment_names = [f["file_name"] for f in wf_attachment]
+    wf_attachment_names = {f["file_name"] for f in wf_attachment}
     for file in wf["workflow_attachment"]:
         if file["file_name"] not in wf_attachment_names:
             wf_attachment.append(file)
@@ -212,12 +212,15 @@ def validate_run_id(run_id: str) -> None:
         abort(404, f"Run ID `{run_id}` does not exist. Please provide a valid run ID.")
 
 
+PROHIBITED_CHARACTERS = frozenset([";", "!", "?", "(", ")", "[", "]", "{", "}", "*", "\\", "&", r"`", "^", "<", ">", "|", "$"])
+
+
 def validate_meta_characters(_type: str, content: str) -> None:
     """\
     This function checks the validity of the string that will be evaluated in the 'eval'
     command within run.sh. The string could be of the type 'workflow_url',
     'workflow_engine', or 'workflow_engine_params'. If any of these strings contain
-    characters from the list of prohibited characters below, the operation will be aborted.
+    characters from `PROHIBITED_CHARACTERS`, the operation will be aborted.
 
     This function is invoked as shown below in the POST /runs endpoint:
 
@@ -225,7 +228,6 @@ def validate_meta_characters(_type: str, content: str) -> None:
     validate_meta_characters("workflow_url", run_request["workflow_url"])
     validate_meta_characters("workflow_engine", run_request["workflow_engine"])
     """
-    prohibited_characters = [";", "!", "?", "(", ")", "[", "]", "{", "}", "*", "\\", "&", r"`", "^", "<", ">", "|", "$"]
     for char in content:
-        if char in prohibited_characters:
+        if char in PROHIBITED_CHARACTERS:
             abort(400, f"The `{_type}` contains a prohibited character `{char}`. Please remove this character.")
@@ -43,7 +43,7 @@ setup(
         "jsonschema",
         "multiqc",
         "psutil",
-        "python-magic",
+        "python-magic>=0.4.20",
         "pyyaml",
         "requests",
         "rocrate",
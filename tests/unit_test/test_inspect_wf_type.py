@@ -0,0 +1,35 @@
+# coding: utf-8
+import pytest
+
+from sapporo.parser import check_by_regexp, check_by_shebang
+
+shebang_test_cases = [
+    ("#!/usr/bin/env cwl-runner\ncwlVersion: v1.0\n", "CWL"),
+    ("#!/usr/bin/env nextflow\nnextflow.enable.dsl=2\n", "NFL"),
+    ("#!/usr/bin/env snakemake\nrule all:\n", "SMK"),
+    ("#!/usr/bin/env cromwell\nversion 1.0\n", "WDL"),
+    ("#!/usr/bin/env streamflow\nversion: v1.0\n", "StreamFlow"),
+    ("#!/usr/bin/env cwl-runner", "CWL"),  # No trailing newline
+    ("#!/bin/bash\n# cwl nextflow\n", "unknown"),  # Only the first line is inspected
+    ("cwlVersion: v1.0\n#!/usr/bin/env cwl-runner\n", "unknown"),  # No shebang
+    ("", "unknown"),
+]
+
+
+@pytest.mark.parametrize("wf_content,expected", shebang_test_cases)
+def test_check_by_shebang(wf_content: str, expected: str) -> None:
+    assert check_by_shebang(wf_content) == expected
+
+
+regexp_test_cases = [
+    ("version 1.0\n\nworkflow main {\n}\n", "WDL"),
+    ("version 1.0\n\ntask hello {\n}\n", "WDL"),
+    ("rule all:\n    input: 'a.txt'\n", "SMK"),
+    ("nextflow.enable.dsl=2\n\nprocess hello {\n}\n", "NFL"),
+    ("echo hello\n", "unknown"),
+]
+
+
+@pytest.mark.parametrize("wf_content,expected", regexp_test_cases)
+def test_check_by_regexp(wf_content: str, expected: str) -> None:
+    assert check_by_regexp(wf_content) == expected
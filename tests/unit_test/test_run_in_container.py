@@ -0,0 +1,58 @@
+# coding: utf-8
+import subprocess
+from pathlib import Path
+from typing import Any, List
+
+from pytest import MonkeyPatch
+
+from sapporo.ro_crate import CONTAINER_OUTPUT_SEPARATOR, run_in_container
+
+
+def file_output(stdout: bytes, exit_code: int) -> bytes:
+    # Same as the `printf '\n%s %s\n'` after each file in the container
+    return stdout + f"\n{CONTAINER_OUTPUT_SEPARATOR} {exit_code}\n".encode()
+
+
+def mock_docker_run(monkeypatch: MonkeyPatch, stdout: bytes) -> List[List[str]]:
+    calls: List[List[str]] = []
+
+    def _run(cmd: List[str], **kwargs: Any) -> "subprocess.CompletedProcess[bytes]":
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr=b"")
+
+    monkeypatch.setattr("sapporo.ro_crate.subprocess.run", _run)
+
+    return calls
+
+
+def test_run_in_container_failed_file(monkeypatch: MonkeyPatch) -> None:
+    stdout = file_output(b'{"a": 1}', 0) + file_output(b"error", 1) + file_output(b'{"c": 3}', 0)
+    mock_docker_run(monkeypatch, stdout)
+    sources = [Path("/data/a.bam"), Path("/data/b.bam"), Path("/data/c.bam")]
+
+    assert run_in_container("image", ["samtools", "flagstats"], sources) == [b'{"a": 1}', None, b'{"c": 3}']
+
+
+def test_run_in_container_truncated_output(monkeypatch: MonkeyPatch) -> None:
+    stdout = file_output(b'{"a": 1}', 0) + b'{"b": '
+    mock_docker_run(monkeypatch, stdout)
+    sources = [Path("/data/a.bam"), Path("/data/b.bam"), Path("/data/c.bam")]
+
+    assert run_in_container("image", ["samtools", "flagstats"], sources) == [b'{"a": 1}', None, None]
+
+
+def test_run_in_container_space_in_file_name(monkeypatch: MonkeyPatch) -> None:
+    calls = mock_docker_run(monkeypatch, file_output(b'{"a": 1}', 0))
+    sources = [Path("/data/my dir/a b.bam")]
+
+    assert run_in_container("image", ["samtools", "flagstats"], sources) == [b'{"a": 1}']
+    cmd = calls[0]
+    assert cmd[cmd.index("-v") + 1] == "/data/my dir/a b.bam:/work/0/a b.bam"
+    assert cmd[-1] == "0/a b.bam"
+
+
+def test_run_in_container_no_files(monkeypatch: MonkeyPatch) -> None:
+    calls = mock_docker_run(monkeypatch, b"")
+
+    assert run_in_container("image", ["samtools", "flagstats"], []) == []
+    assert calls == []